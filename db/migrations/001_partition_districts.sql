@@ -0,0 +1,76 @@
+-- Upgrade a database created from the original schema to partitioned
+-- districts and the keys the sync upserts on. schema.sql already has these
+-- changes for new databases; this is for databases created before them.
+--
+-- Runs in one transaction. If districts has duplicate (district_type,
+-- district_code) rows or officials has duplicate (source_type, source_id)
+-- rows, the unique constraints fail and nothing is changed; remove the
+-- duplicates and run it again.
+
+BEGIN;
+
+-- officials.district_id can only reference districts(id) while id alone is
+-- the primary key
+ALTER TABLE officials DROP CONSTRAINT IF EXISTS officials_district_id_fkey;
+
+-- Move the old table and the names it holds out of the way
+ALTER TABLE districts RENAME TO districts_unpartitioned;
+ALTER INDEX districts_pkey RENAME TO districts_unpartitioned_pkey;
+ALTER SEQUENCE districts_id_seq RENAME TO districts_unpartitioned_id_seq;
+DROP INDEX IF EXISTS districts_boundary_idx;
+
+-- Districts table, partitioned by type
+CREATE TABLE districts (
+    id SERIAL,
+    district_type VARCHAR(50) NOT NULL,
+    state_fips VARCHAR(2),
+    district_code VARCHAR(50),
+    name VARCHAR(100),
+    boundary GEOMETRY(MultiPolygon, 4326),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, district_type),
+    UNIQUE (district_type, district_code)
+) PARTITION BY LIST (district_type);
+
+CREATE TABLE districts_federal_congressional PARTITION OF districts
+    FOR VALUES IN ('federal_congressional');
+CREATE TABLE districts_state_senate PARTITION OF districts
+    FOR VALUES IN ('state_senate');
+CREATE TABLE districts_state_house PARTITION OF districts
+    FOR VALUES IN ('state_house');
+CREATE TABLE districts_other PARTITION OF districts DEFAULT;
+
+-- Ids are kept so existing officials.district_id values stay valid
+INSERT INTO districts (
+    id, district_type, state_fips, district_code, name, boundary,
+    created_at, updated_at
+)
+SELECT
+    id, district_type, state_fips, district_code, name, boundary,
+    created_at, updated_at
+FROM districts_unpartitioned;
+
+DROP TABLE districts_unpartitioned;
+
+SELECT setval(
+    pg_get_serial_sequence('districts', 'id'),
+    COALESCE(MAX(id), 0) + 1,
+    false
+) FROM districts;
+
+CREATE INDEX districts_boundary_idx ON districts USING GIST (boundary);
+CREATE INDEX districts_id_idx ON districts (id)
+    INCLUDE (name, district_type, state_fips, district_code, updated_at);
+
+CREATE TRIGGER update_districts_updated_at
+    BEFORE UPDATE ON districts
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- Officials are upserted on their source key and looked up by district
+ALTER TABLE officials
+    ADD CONSTRAINT officials_source_type_source_id_key UNIQUE (source_type, source_id);
+CREATE INDEX IF NOT EXISTS officials_district_id_idx ON officials (district_id);
+
+COMMIT;
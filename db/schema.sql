@@ -3,24 +3,35 @@
 -- Enable PostGIS extension
 CREATE EXTENSION IF NOT EXISTS postgis;
 
--- Districts table
+-- Districts table, partitioned by type so each type has its own smaller
+-- spatial index and type-filtered lookups only scan one partition
 CREATE TABLE districts (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     district_type VARCHAR(50) NOT NULL,  -- federal_congressional, state_senate, etc.
     state_fips VARCHAR(2),
     district_code VARCHAR(50),
     name VARCHAR(100),
     boundary GEOMETRY(MultiPolygon, 4326),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, district_type),
+    UNIQUE (district_type, district_code)
+) PARTITION BY LIST (district_type);
+
+CREATE TABLE districts_federal_congressional PARTITION OF districts
+    FOR VALUES IN ('federal_congressional');
+CREATE TABLE districts_state_senate PARTITION OF districts
+    FOR VALUES IN ('state_senate');
+CREATE TABLE districts_state_house PARTITION OF districts
+    FOR VALUES IN ('state_house');
+CREATE TABLE districts_other PARTITION OF districts DEFAULT;
 
 -- Officials table
 CREATE TABLE officials (
     id SERIAL PRIMARY KEY,
     full_name VARCHAR(100) NOT NULL,
     office_title VARCHAR(100) NOT NULL,
-    district_id INTEGER REFERENCES districts(id),
+    district_id INTEGER,  -- districts.id; not a foreign key, as the partitioned key is (id, district_type)
     party VARCHAR(50),
     email VARCHAR(255),
     phone VARCHAR(20),
@@ -30,7 +41,8 @@ CREATE TABLE officials (
     source_type VARCHAR(50),  -- openstates, dnc_roster, etc.
     source_id VARCHAR(100),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (source_type, source_id)
 );
 
 -- Offices table (physical locations)
@@ -71,11 +83,18 @@ CREATE TABLE address_cache (
     UNIQUE(normalized_address)
 );
 
--- Spatial indices
+-- Spatial indices (created on every districts partition)
 CREATE INDEX districts_boundary_idx ON districts USING GIST (boundary);
 CREATE INDEX offices_location_idx ON offices USING GIST (location);
 CREATE INDEX address_cache_location_idx ON address_cache USING GIST (location);
 
+-- Officials are looked up by the districts containing a point
+CREATE INDEX officials_district_id_idx ON officials (district_id);
+
+-- Covering index for district lookups by id
+CREATE INDEX districts_id_idx ON districts (id)
+    INCLUDE (name, district_type, state_fips, district_code, updated_at);
+
 -- Update triggers for timestamp management
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
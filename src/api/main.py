@@ -1,14 +1,22 @@
 """FastAPI implementation for Civic Data Hub."""
 
-from typing import List, Optional
+import asyncio
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import asyncpg
+from cachetools import TTLCache
+from geopy.adapters import AioHTTPAdapter
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut
-import json
-
-app = FastAPI(title="Civic Data Hub API")
+from geopy.extra.rate_limiter import AsyncRateLimiter
+import orjson
+from shapely import wkb
+from shapely.geometry import Point
 
 # Database connection configuration
 DATABASE_CONFIG = {
@@ -18,6 +26,261 @@ DATABASE_CONFIG = {
     "database": "civic_data_hub"
 }
 
+# Connection pool sizing and per-session server settings. Every worker opens
+# its own pool, so WEB_CONCURRENCY x max_size plus the sync's pool (10) must
+# stay under the server's max_connections; the defaults put 4 workers at 90
+# of PostgreSQL's default 100. JIT is disabled because its compile time
+# dwarfs the runtime of the short PostGIS queries.
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+POOL_CONFIG = {
+    "min_size": int(os.getenv("DB_POOL_MIN_SIZE", str(DB_POOL_MAX_SIZE))),
+    "max_size": DB_POOL_MAX_SIZE,
+    "max_queries": int(os.getenv("DB_POOL_MAX_QUERIES", "50000")),
+    "max_inactive_connection_lifetime": float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "300")),
+    "statement_cache_size": 1024,
+    "command_timeout": float(os.getenv("DB_COMMAND_TIMEOUT", "5")),
+    "server_settings": {
+        "jit": "off",
+        "work_mem": "64MB",
+        "application_name": "civic_data_hub"
+    }
+}
+
+# Maximum number of requests handled at once by each worker; past this the
+# API answers 503 instead of queueing work and memory without bound
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "500"))
+
+# Maximum number of in-flight geocoder requests, and the minimum delay
+# between starting two of them. Both apply per worker process. The public
+# Nominatim service allows at most one request per second in total, so the
+# delay defaults to the worker count in seconds; a self-hosted instance can
+# lower the delay and raise the concurrency.
+GEOCODER_CONCURRENCY = int(os.getenv("GEOCODER_CONCURRENCY", "1"))
+GEOCODER_MIN_DELAY = float(os.getenv(
+    "GEOCODER_MIN_DELAY_SECONDS", os.getenv("WEB_CONCURRENCY", "1")
+))
+
+# In-process cache of geocoded locations, keyed by normalized address, in
+# front of the address_cache table. Only locations are kept; districts and
+# officials are always read from the database, so a sync shows up at once.
+LOOKUP_CACHE_SIZE = int(os.getenv("LOOKUP_CACHE_SIZE", "50000"))
+LOOKUP_CACHE_TTL = int(os.getenv("LOOKUP_CACHE_TTL_SECONDS", "3600"))
+
+# In-process cache of serialized district features, bounded by total bytes
+# and keyed by (id, updated_at) so a sync that rewrites a district misses
+FEATURE_CACHE_BYTES = int(os.getenv("FEATURE_CACHE_BYTES", str(256 * 1024 * 1024)))
+FEATURE_CACHE_TTL = int(os.getenv("FEATURE_CACHE_TTL_SECONDS", "3600"))
+
+# Districts containing the resolved point and their officials, aggregated
+# server-side into a single JSON object. Expects a one-row ``point`` CTE;
+# ``located`` is false when there is no point, ``location`` is the point
+# itself and ``payload`` is NULL when no district contains it.
+_DISTRICTS_AND_OFFICIALS_SQL = '''
+    districts_found AS (
+        SELECT d.id, d.name, d.district_type, d.state_fips, d.district_code
+        FROM districts d, point
+        WHERE ST_Contains(d.boundary, point.location)
+    ),
+    officials_found AS (
+        SELECT id, full_name, office_title, party, email, phone, website
+        FROM officials
+        WHERE district_id IN (SELECT id FROM districts_found)
+    )
+    SELECT
+        EXISTS (SELECT 1 FROM point) AS located,
+        (SELECT location FROM point) AS location,
+        CASE WHEN EXISTS (SELECT 1 FROM districts_found) THEN json_build_object(
+            'districts', (SELECT json_agg(districts_found) FROM districts_found),
+            'officials', COALESCE((SELECT json_agg(officials_found) FROM officials_found), '[]'::json)
+        ) END AS payload
+'''
+
+# Lookup through the address cache
+CACHED_LOOKUP_SQL = '''
+    WITH point AS (
+        SELECT location FROM address_cache
+        WHERE normalized_address = $1
+        AND expires_at > CURRENT_TIMESTAMP
+    ),
+''' + _DISTRICTS_AND_OFFICIALS_SQL
+
+# Lookup for a location already known in process
+POINT_LOOKUP_SQL = '''
+    WITH point AS (
+        SELECT $1::geometry AS location
+    ),
+''' + _DISTRICTS_AND_OFFICIALS_SQL
+
+# Lookup for a freshly geocoded point, caching it in the same statement
+GEOCODED_LOOKUP_SQL = '''
+    WITH point AS (
+        INSERT INTO address_cache (address, normalized_address, location, expires_at)
+        VALUES ($1, $2, $3, CURRENT_TIMESTAMP + INTERVAL '30 days')
+        ON CONFLICT (normalized_address) 
+        DO UPDATE SET
+            location = EXCLUDED.location,
+            expires_at = EXCLUDED.expires_at
+        RETURNING location
+    ),
+''' + _DISTRICTS_AND_OFFICIALS_SQL
+
+# Districts containing a lng/lat point
+DISTRICTS_AT_POINT_SQL = '''
+    SELECT id, updated_at
+    FROM districts
+    WHERE ST_Contains(boundary, ST_SetSRID(ST_MakePoint($1, $2), 4326))
+'''
+
+# Districts of one type containing a lng/lat point; the type filter lets the
+# planner prune to that type's partition
+DISTRICTS_OF_TYPE_AT_POINT_SQL = DISTRICTS_AT_POINT_SQL + '''
+    AND district_type = $3
+'''
+
+# District features by id, streamed to the client through a cursor
+DISTRICT_FEATURES_SQL = '''
+    SELECT 
+        id, 
+        name, 
+        district_type, 
+        state_fips, 
+        district_code,
+        updated_at,
+        ST_AsGeoJSON(boundary) as geometry
+    FROM districts
+    WHERE id = ANY($1::int[])
+'''
+
+# Bulk lookup: cached locations for a batch of normalized addresses
+BULK_CACHED_LOCATIONS_SQL = '''
+    SELECT normalized_address, location
+    FROM address_cache
+    WHERE normalized_address = ANY($1::text[])
+    AND expires_at > CURRENT_TIMESTAMP
+'''
+
+# Bulk lookup: districts and officials for each point, tagged with the
+# point's index and aggregated server-side into one JSON object per point.
+# Points cross the wire as geometries through the EWKB codec. Points
+# carrying an address were freshly geocoded and are cached in the same
+# statement.
+BULK_LOOKUP_SQL = '''
+    WITH points AS (
+        SELECT *
+        FROM unnest($1::int[], $2::geometry[], $3::text[], $4::text[])
+            AS p(idx, location, address, normalized_address)
+    ),
+    cached AS (
+        INSERT INTO address_cache (address, normalized_address, location, expires_at)
+        SELECT
+            address,
+            normalized_address,
+            location,
+            CURRENT_TIMESTAMP + INTERVAL '30 days'
+        FROM points
+        WHERE address IS NOT NULL
+        ON CONFLICT (normalized_address) 
+        DO UPDATE SET
+            location = EXCLUDED.location,
+            expires_at = EXCLUDED.expires_at
+    ),
+    matched AS (
+        SELECT p.idx, d.id, d.name, d.district_type, d.state_fips, d.district_code
+        FROM points p
+        JOIN districts d
+            ON ST_Contains(d.boundary, p.location)
+    )
+    SELECT m.idx, json_build_object(
+        'districts', json_agg(json_build_object(
+            'id', m.id,
+            'name', m.name,
+            'district_type', m.district_type,
+            'state_fips', m.state_fips,
+            'district_code', m.district_code
+        )),
+        'officials', COALESCE((
+            SELECT json_agg(o) FROM (
+                SELECT id, full_name, office_title, party, email, phone, website
+                FROM officials
+                WHERE district_id IN (SELECT id FROM matched WHERE matched.idx = m.idx)
+            ) o
+        ), '[]'::json)
+    ) AS payload
+    FROM matched m
+    GROUP BY m.idx
+'''
+
+# Official details with district and office locations, serialized server-side
+OFFICIAL_DETAILS_SQL = '''
+    SELECT
+        (
+            SELECT to_json(official) FROM (
+                SELECT 
+                    o.*,
+                    d.name as district_name,
+                    d.district_type,
+                    d.state_fips,
+                    d.district_code
+                FROM officials o
+                JOIN districts d ON o.district_id = d.id
+                WHERE o.id = $1
+            ) official
+        ) AS official,
+        COALESCE((
+            SELECT json_agg(office) FROM (
+                SELECT 
+                    office_type,
+                    address_line1,
+                    address_line2,
+                    city,
+                    state,
+                    zip,
+                    phone,
+                    ST_AsGeoJSON(location)::json as location
+                FROM offices
+                WHERE official_id = $1
+            ) office
+        ), '[]'::json) AS offices
+'''
+
+class HubConnection(asyncpg.Connection):
+    """Pooled connection carrying the prepared statements for the hot paths."""
+
+class AddressLock:
+    """Lock shared by concurrent lookups of one address.
+
+    ``users`` counts the requests holding or waiting on the lock, so the
+    entry is only dropped once none are left.
+    """
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+def encode_geometry(geometry) -> bytes:
+    """Encode a shapely geometry as EWKB in SRID 4326."""
+    return wkb.dumps(geometry, srid=4326)
+
+async def init_connection(conn: HubConnection):
+    """Set up a new pooled connection.
+
+    PostGIS geometries cross the wire as binary EWKB decoded to and from
+    shapely objects, so no WKT is formatted or parsed on either side. The
+    hot-path statements are prepared after the codec is in place.
+    """
+    await conn.set_type_codec(
+        'geometry',
+        schema='public',
+        encoder=encode_geometry,
+        decoder=wkb.loads,
+        format='binary'
+    )
+    conn.cached_lookup = await conn.prepare(CACHED_LOOKUP_SQL)
+    conn.geocoded_lookup = await conn.prepare(GEOCODED_LOOKUP_SQL)
+    conn.point_lookup = await conn.prepare(POINT_LOOKUP_SQL)
+    conn.districts_at_point = await conn.prepare(DISTRICTS_AT_POINT_SQL)
+    conn.districts_of_type_at_point = await conn.prepare(DISTRICTS_OF_TYPE_AT_POINT_SQL)
+
 # Models
 class Official(BaseModel):
     id: int
@@ -41,175 +304,362 @@ class RepresentativeResponse(BaseModel):
     districts: List[District]
     officials: List[Official]
 
-@app.on_event("startup")
-async def startup():
-    """Create database pool on startup."""
-    app.state.pool = await asyncpg.create_pool(**DATABASE_CONFIG)
-    app.state.geocoder = Nominatim(user_agent="civic_data_hub")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the database pool, geocoder and caches for the app's lifetime.
+
+    asyncpg opens ``min_size`` connections while creating the pool and runs
+    ``init_connection`` on each. Only those are warmed; ``min_size`` defaults
+    to ``max_size`` so the whole pool is connected and prepared before the
+    first request.
+    """
+    app.state.pool = await asyncpg.create_pool(
+        **DATABASE_CONFIG,
+        **POOL_CONFIG,
+        connection_class=HubConnection,
+        init=init_connection
+    )
+    try:
+        async with Nominatim(
+            user_agent="civic_data_hub",
+            adapter_factory=AioHTTPAdapter
+        ) as geocoder:
+            app.state.geocoder = geocoder
+            # No retries or swallowed errors: timeouts still surface as 408
+            app.state.geocode = AsyncRateLimiter(
+                geocoder.geocode,
+                min_delay_seconds=GEOCODER_MIN_DELAY,
+                max_retries=0,
+                swallow_exceptions=False
+            )
+            app.state.geocoder_semaphore = asyncio.Semaphore(GEOCODER_CONCURRENCY)
+            app.state.lookup_cache = TTLCache(maxsize=LOOKUP_CACHE_SIZE, ttl=LOOKUP_CACHE_TTL)
+            app.state.lookup_locks = defaultdict(AddressLock)
+            app.state.feature_cache = TTLCache(
+                maxsize=FEATURE_CACHE_BYTES, ttl=FEATURE_CACHE_TTL, getsizeof=len
+            )
+            yield
+    finally:
+        await app.state.pool.close()
+
+class ConcurrencyLimitMiddleware:
+    """Reject HTTP requests with a 503 while too many are in flight.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so a slot stays taken until
+    the whole response body, including streamed GeoJSON, has been sent.
+    """
 
-@app.on_event("shutdown")
-async def shutdown():
-    """Close database pool on shutdown."""
-    await app.state.pool.close()
+    def __init__(self, app, limit: int):
+        self.app = app
+        self.limit = limit
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        if self.in_flight >= self.limit:
+            response = ORJSONResponse(
+                {"detail": "Server busy, try again shortly"},
+                status_code=503,
+                headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+app = FastAPI(
+    title="Civic Data Hub API",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+app.add_middleware(ConcurrencyLimitMiddleware, limit=MAX_CONCURRENT_REQUESTS)
 
 async def geocode_address(address: str) -> tuple:
     """Geocode address to coordinates."""
     try:
-        location = app.state.geocoder.geocode(address)
+        async with app.state.geocoder_semaphore:
+            location = await app.state.geocode(address)
         if location:
             return location.latitude, location.longitude
         raise HTTPException(status_code=404, detail="Address not found")
     except GeocoderTimedOut:
         raise HTTPException(status_code=408, detail="Geocoding service timeout")
 
-@app.get("/api/v1/lookup", response_model=RepresentativeResponse)
-async def lookup_representatives(address: str):
+async def fetch_representatives(address: str, normalized_address: str) -> bytes:
+    """Resolve districts and officials for an address from the database.
+
+    The location is taken from the in-process cache, the address_cache
+    table or the geocoder, in that order; districts and officials are
+    always read fresh. Returns the JSON object built by the database, as
+    bytes.
+    """
+    location = app.state.lookup_cache.get(normalized_address)
+    if location is not None:
+        async with app.state.pool.acquire() as conn:
+            row = await conn.point_lookup.fetchrow(location)
+    else:
+        # Cache hit: districts and officials come back in the same round-trip
+        async with app.state.pool.acquire() as conn:
+            row = await conn.cached_lookup.fetchrow(normalized_address)
+        
+        if not row['located']:
+            # Geocode without holding a connection, then cache and look up at once
+            lat, lon = await geocode_address(address)
+            async with app.state.pool.acquire() as conn:
+                row = await conn.geocoded_lookup.fetchrow(
+                    address, normalized_address, Point(lon, lat)
+                )
+        app.state.lookup_cache[normalized_address] = row['location']
+    
+    if row['payload'] is None:
+        raise HTTPException(status_code=404, detail="No districts found for this address")
+    return row['payload'].encode()
+
+async def fetch_bulk_representatives(
+    pending: Dict[str, str]
+) -> Tuple[Dict[str, bytes], Dict[str, str]]:
+    """Resolve many addresses with a single districts-and-officials query.
+
+    ``pending`` maps normalized addresses to the address as given. Returns
+    the JSON lookup payloads and the error messages, both keyed by
+    normalized address. Locations are cached in process like single
+    lookups; districts and officials are always read fresh.
+    """
+    points = {}
+    for normalized_address in pending:
+        location = app.state.lookup_cache.get(normalized_address)
+        if location is not None:
+            points[normalized_address] = location
+    
+    uncached = [n for n in pending if n not in points]
+    if uncached:
+        async with app.state.pool.acquire() as conn:
+            rows = await conn.fetch(BULK_CACHED_LOCATIONS_SQL, uncached)
+        for r in rows:
+            points[r['normalized_address']] = r['location']
+    
+    # Geocode the cache misses concurrently; geocode_address bounds the fan-out
+    misses = [n for n in pending if n not in points]
+    geocoded = await asyncio.gather(
+        *(geocode_address(pending[n]) for n in misses), return_exceptions=True
+    )
+    errors = {}
+    geocoded_addresses = {}
+    for normalized_address, result in zip(misses, geocoded):
+        if isinstance(result, HTTPException):
+            errors[normalized_address] = str(result.detail)
+        elif isinstance(result, BaseException):
+            errors[normalized_address] = str(result)
+        else:
+            lat, lon = result
+            points[normalized_address] = Point(lon, lat)
+            geocoded_addresses[normalized_address] = pending[normalized_address]
+    
+    located = list(points)
+    if not located:
+        return {}, errors
+    for normalized_address in located:
+        app.state.lookup_cache[normalized_address] = points[normalized_address]
+    
+    # New locations are cached by the same statement that looks them up. A
+    # failed batch is reported against each located address rather than
+    # failing the whole request.
+    try:
+        async with app.state.pool.acquire() as conn:
+            rows = await conn.fetch(
+                BULK_LOOKUP_SQL,
+                list(range(len(located))),
+                [points[n] for n in located],
+                [geocoded_addresses.get(n) for n in located],
+                located
+            )
+    except Exception as e:
+        message = str(e) or type(e).__name__
+        for normalized_address in located:
+            errors[normalized_address] = message
+        return {}, errors
+    
+    payloads = {located[r['idx']]: r['payload'].encode() for r in rows}
+    for normalized_address in located:
+        if normalized_address not in payloads:
+            errors[normalized_address] = "No districts found for this address"
+    return payloads, errors
+
+def lookup_result(address: str, normalized_address: str, payload: bytes) -> bytes:
+    """Prefix a districts/officials JSON object with the address fields."""
+    return (
+        b'{"address":' + orjson.dumps(address) +
+        b',"normalized_address":' + orjson.dumps(normalized_address) +
+        b',' + payload[1:]
+    )
+
+# The payload is JSON built by the database and is passed through without
+# re-validation or re-encoding; the model only documents the schema
+@app.get(
+    "/api/v1/lookup",
+    response_model=None,
+    responses={200: {"model": RepresentativeResponse}}
+)
+async def lookup_representatives(address: str) -> Response:
     """Look up representatives for a given address."""
+    normalized_address = address.lower()
     
-    # First check the cache
+    if normalized_address in app.state.lookup_cache:
+        payload = await fetch_representatives(address, normalized_address)
+    else:
+        # One geocoder per address; concurrent callers wait and then reuse
+        # the location it cached
+        entry = app.state.lookup_locks[normalized_address]
+        entry.users += 1
+        try:
+            async with entry.lock:
+                payload = await fetch_representatives(address, normalized_address)
+        finally:
+            entry.users -= 1
+            if not entry.users:
+                del app.state.lookup_locks[normalized_address]
+    
+    return Response(
+        lookup_result(address, normalized_address, payload),
+        media_type="application/json"
+    )
+
+def district_feature(district) -> bytes:
+    """Serialize a district row as a GeoJSON Feature.
+
+    The geometry is already GeoJSON text from ST_AsGeoJSON and is spliced
+    in as is rather than parsed and re-encoded.
+    """
+    properties = orjson.dumps({
+        "id": district['id'],
+        "name": district['name'],
+        "district_type": district['district_type'],
+        "state_fips": district['state_fips'],
+        "district_code": district['district_code']
+    })
+    return (
+        b'{"type":"Feature","properties":' + properties +
+        b',"geometry":' + district['geometry'].encode() + b'}'
+    )
+
+def cache_district_feature(district, feature: bytes):
+    """Keep a serialized feature unless it alone exceeds the cache budget."""
+    cache = app.state.feature_cache
+    if len(feature) <= cache.maxsize:
+        cache[(district['id'], district['updated_at'])] = feature
+
+async def stream_district_features(cached: List[bytes], missing_ids: List[int]):
+    """Yield a FeatureCollection, streaming uncached features from a server-side cursor."""
+    yield b'{"type":"FeatureCollection","features":[' + b','.join(cached)
+    separator = b',' if cached else b''
     async with app.state.pool.acquire() as conn:
-        cached = await conn.fetchrow('''
-            SELECT * FROM address_cache 
-            WHERE normalized_address = $1 
-            AND expires_at > CURRENT_TIMESTAMP
-        ''', address.lower())
-        
-        if cached:
-            location = cached['location']
-        else:
-            # Geocode the address
-            lat, lon = await geocode_address(address)
-            location = f'POINT({lon} {lat})'
-            
-            # Cache the result
-            await conn.execute('''
-                INSERT INTO address_cache (address, normalized_address, location, expires_at)
-                VALUES ($1, $2, ST_GeomFromText($3, 4326), CURRENT_TIMESTAMP + INTERVAL '30 days')
-                ON CONFLICT (normalized_address) 
-                DO UPDATE SET
-                    location = EXCLUDED.location,
-                    expires_at = EXCLUDED.expires_at
-            ''', address, address.lower(), location)
-        
-        # Find districts that contain this point
-        districts = await conn.fetch('''
-            SELECT id, name, district_type, state_fips, district_code
-            FROM districts
-            WHERE ST_Contains(boundary, ST_GeomFromText($1, 4326))
-        ''', location)
-        
-        if not districts:
-            raise HTTPException(status_code=404, detail="No districts found for this address")
-        
-        # Get officials for these districts
-        officials = await conn.fetch('''
-            SELECT id, full_name, office_title, party, email, phone, website
-            FROM officials
-            WHERE district_id = ANY($1)
-        ''', [d['id'] for d in districts])
-        
-        return {
-            "address": address,
-            "normalized_address": address.lower(),
-            "districts": [dict(d) for d in districts],
-            "officials": [dict(o) for o in officials]
-        }
+        async with conn.transaction():
+            async for district in conn.cursor(DISTRICT_FEATURES_SQL, missing_ids):
+                feature = district_feature(district)
+                cache_district_feature(district, feature)
+                yield separator + feature
+                separator = b','
+    yield b']}'
 
 @app.get("/api/v1/districts")
-async def get_district_boundaries(lat: float, lng: float):
-    """Get district boundaries for a point."""
+async def get_district_boundaries(
+    lat: float,
+    lng: float,
+    district_type: Optional[str] = None
+):
+    """Get district boundaries for a point, optionally of a single type."""
     async with app.state.pool.acquire() as conn:
-        districts = await conn.fetch('''
-            SELECT 
-                id, 
-                name, 
-                district_type, 
-                state_fips, 
-                district_code,
-                ST_AsGeoJSON(boundary) as geometry
-            FROM districts
-            WHERE ST_Contains(boundary, ST_SetSRID(ST_MakePoint($1, $2), 4326))
-        ''', lng, lat)
-        
-        if not districts:
-            raise HTTPException(status_code=404, detail="No districts found for this location")
-        
-        return {
-            "type": "FeatureCollection",
-            "features": [
-                {
-                    "type": "Feature",
-                    "properties": {
-                        "id": d['id'],
-                        "name": d['name'],
-                        "district_type": d['district_type'],
-                        "state_fips": d['state_fips'],
-                        "district_code": d['district_code']
-                    },
-                    "geometry": json.loads(d['geometry'])
-                }
-                for d in districts
-            ]
-        }
+        if district_type is None:
+            districts = await conn.districts_at_point.fetch(lng, lat)
+        else:
+            districts = await conn.districts_of_type_at_point.fetch(lng, lat, district_type)
+    
+    if not districts:
+        raise HTTPException(status_code=404, detail="No districts found for this location")
+    
+    cached = []
+    missing_ids = []
+    for d in districts:
+        feature = app.state.feature_cache.get((d['id'], d['updated_at']))
+        if feature is None:
+            missing_ids.append(d['id'])
+        else:
+            cached.append(feature)
+    
+    if not missing_ids:
+        return Response(
+            b'{"type":"FeatureCollection","features":[' + b','.join(cached) + b']}',
+            media_type="application/json"
+        )
+    
+    # The connection for the geometries is only taken once streaming starts
+    return StreamingResponse(
+        stream_district_features(cached, missing_ids),
+        media_type="application/json"
+    )
 
 @app.get("/api/v1/bulk-lookup")
 async def bulk_lookup_representatives(
     addresses: List[str] = Query(..., max_length=100)
 ):
     """Bulk lookup of representatives for multiple addresses."""
+    pending = {}
+    for address in addresses:
+        pending.setdefault(address.lower(), address)
+    
+    payloads, errors = await fetch_bulk_representatives(pending)
+    
     results = []
-    async with app.state.pool.acquire() as conn:
-        for address in addresses:
-            try:
-                result = await lookup_representatives(address)
-                results.append({"address": address, "result": result, "error": None})
-            except HTTPException as e:
-                results.append({"address": address, "result": None, "error": str(e.detail)})
-            except Exception as e:
-                results.append({"address": address, "result": None, "error": str(e)})
+    for address in addresses:
+        normalized_address = address.lower()
+        if normalized_address in payloads:
+            result = lookup_result(address, normalized_address, payloads[normalized_address])
+            results.append(
+                b'{"address":' + orjson.dumps(address) +
+                b',"result":' + result + b',"error":null}'
+            )
+        else:
+            results.append(orjson.dumps(
+                {"address": address, "result": None, "error": errors[normalized_address]}
+            ))
     
-    return {"results": results}
+    return Response(
+        b'{"results":[' + b','.join(results) + b']}',
+        media_type="application/json"
+    )
 
 @app.get("/api/v1/official/{official_id}")
 async def get_official_details(official_id: int):
     """Get detailed information about an official."""
     async with app.state.pool.acquire() as conn:
-        # Get official details
-        official = await conn.fetchrow('''
-            SELECT 
-                o.*,
-                d.name as district_name,
-                d.district_type,
-                d.state_fips,
-                d.district_code
-            FROM officials o
-            JOIN districts d ON o.district_id = d.id
-            WHERE o.id = $1
-        ''', official_id)
-        
-        if not official:
-            raise HTTPException(status_code=404, detail="Official not found")
-        
-        # Get office locations
-        offices = await conn.fetch('''
-            SELECT 
-                office_type,
-                address_line1,
-                address_line2,
-                city,
-                state,
-                zip,
-                phone,
-                ST_AsGeoJSON(location) as location
-            FROM offices
-            WHERE official_id = $1
-        ''', official_id)
-        
-        return {
-            "official": dict(official),
-            "offices": [dict(o) for o in offices]
-        }
+        row = await conn.fetchrow(OFFICIAL_DETAILS_SQL, official_id)
+    
+    if row['official'] is None:
+        raise HTTPException(status_code=404, detail="Official not found")
+    
+    return Response(
+        b'{"official":' + row['official'].encode() +
+        b',"offices":' + row['offices'].encode() + b'}',
+        media_type="application/json"
+    )
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        backlog=2048,
+        limit_concurrency=1000,
+        limit_max_requests=10000,
+        timeout_keep_alive=30
+    )
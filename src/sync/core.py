@@ -1,6 +1,7 @@
 """Core synchronization functionality for Civic Data Hub."""
 
 import asyncio
+import json
 import logging
 from typing import List, Dict, Any
 from datetime import datetime
@@ -9,6 +10,22 @@ import asyncpg
 
 logger = logging.getLogger(__name__)
 
+# Columns written by update_districts, in record order
+DISTRICT_COLUMNS = (
+    'district_type', 'state_fips', 'district_code', 'name', 'boundary'
+)
+
+# Columns written by update_officials, in record order
+OFFICIAL_COLUMNS = (
+    'full_name', 'office_title', 'district_id', 'party',
+    'email', 'phone', 'website', 'term_start', 'term_end',
+    'source_type', 'source_id'
+)
+
+def geojson_text(geometry) -> str:
+    """Return a GeoJSON geometry as text, serializing it if still a mapping."""
+    return geometry if isinstance(geometry, str) else json.dumps(geometry)
+
 class DataSync:
     """Main data synchronization class."""
     
@@ -16,27 +33,55 @@ class DataSync:
         self.db_config = db_config
         self.source_config = source_config
         self.pool = None
+        self.session = None
     
     async def init_db_pool(self):
         """Initialize database connection pool."""
         self.pool = await asyncpg.create_pool(**self.db_config)
     
+    async def init_http_session(self):
+        """Initialize the HTTP session shared by all source API requests."""
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=20,
+                ttl_dns_cache=300,
+                keepalive_timeout=60
+            ),
+            timeout=aiohttp.ClientTimeout(total=30)
+        )
+    
+    async def close(self):
+        """Close the HTTP session and database pool, if open."""
+        if self.session:
+            await self.session.close()
+            self.session = None
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+    
     async def fetch_openstates_data(self) -> List[Dict[str, Any]]:
-        """Fetch data from OpenStates API."""
-        async with aiohttp.ClientSession() as session:
-            headers = {'apikey': self.source_config['openstates']['api_key']}
-            url = f"{self.source_config['openstates']['base_url']}/jurisdictions"
-            
-            try:
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        logger.error(f"OpenStates API error: {response.status}")
-                        return []
-            except Exception as e:
-                logger.error(f"Error fetching OpenStates data: {e}")
-                return []
+        """Fetch data from OpenStates API.
+        
+        Opens the HTTP session if needed; callers outside sync_all must
+        call close() when done.
+        """
+        if self.session is None:
+            await self.init_http_session()
+        
+        headers = {'apikey': self.source_config['openstates']['api_key']}
+        url = f"{self.source_config['openstates']['base_url']}/jurisdictions"
+        
+        try:
+            async with self.session.get(url, headers=headers) as response:
+                if response.status == 200:
+                    return await response.json()
+                else:
+                    logger.error(f"OpenStates API error: {response.status}")
+                    return []
+        except Exception as e:
+            logger.error(f"Error fetching OpenStates data: {e}")
+            return []
     
     async def fetch_census_data(self) -> List[Dict[str, Any]]:
         """Fetch Census TIGER/Line data."""
@@ -45,30 +90,93 @@ class DataSync:
         pass
     
     async def update_districts(self, districts: List[Dict[str, Any]]):
-        """Update district information in database."""
+        """Update district information in database.
+        
+        Boundaries are COPYed as GeoJSON text into a temporary staging
+        table and parsed into geometries by the merging upsert. As for
+        officials, the last staged row for a district wins and rows without
+        a district_code are all inserted.
+        """
+        records = (
+            (district['type'], district['state'], district['code'],
+             district['name'], geojson_text(district['geometry']))
+            for district in districts
+        )
+        columns = ', '.join(DISTRICT_COLUMNS)
         async with self.pool.acquire() as conn:
-            for district in districts:
+            async with conn.transaction():
                 await conn.execute('''
-                    INSERT INTO districts (district_type, state_fips, district_code, name, boundary)
-                    VALUES ($1, $2, $3, $4, ST_GeomFromGeoJSON($5))
-                    ON CONFLICT (district_code) 
-                    DO UPDATE SET 
+                    CREATE TEMP TABLE stage_districts ON COMMIT DROP AS
+                    SELECT district_type, state_fips, district_code, name,
+                           NULL::text AS boundary
+                    FROM districts WITH NO DATA;
+                    ALTER TABLE stage_districts ADD COLUMN ord BIGSERIAL;
+                ''')
+                await conn.copy_records_to_table(
+                    'stage_districts', records=records, columns=DISTRICT_COLUMNS
+                )
+                await conn.execute(f'''
+                    INSERT INTO districts ({columns})
+                    SELECT district_type, state_fips, district_code, name,
+                           ST_GeomFromGeoJSON(boundary)
+                    FROM (
+                        SELECT DISTINCT ON (district_type, district_code) *
+                        FROM stage_districts
+                        WHERE district_code IS NOT NULL
+                        ORDER BY district_type, district_code, ord DESC
+                    ) latest
+                    UNION ALL
+                    SELECT district_type, state_fips, district_code, name,
+                           ST_GeomFromGeoJSON(boundary)
+                    FROM stage_districts
+                    WHERE district_code IS NULL
+                    ON CONFLICT (district_type, district_code)
+                    DO UPDATE SET
                         name = EXCLUDED.name,
                         boundary = EXCLUDED.boundary,
                         updated_at = CURRENT_TIMESTAMP
-                ''', district['type'], district['state'], district['code'],
-                     district['name'], district['geometry'])
+                ''')
     
     async def update_officials(self, officials: List[Dict[str, Any]]):
-        """Update official information in database."""
+        """Update official information in database.
+        
+        Rows are COPYed into a temporary staging table and merged into
+        officials with a single upsert, all inside one transaction. Staged
+        rows are numbered so that, as with one upsert per row, the last of
+        several rows for the same source wins; rows without a complete
+        source key never conflict and are all inserted.
+        """
+        records = (
+            (official['name'], official['title'],
+             official['district_id'], official['party'],
+             official['email'], official['phone'],
+             official['website'], official['term_start'],
+             official['term_end'], official['source'],
+             official['source_id'])
+            for official in officials
+        )
+        columns = ', '.join(OFFICIAL_COLUMNS)
         async with self.pool.acquire() as conn:
-            for official in officials:
-                await conn.execute('''
-                    INSERT INTO officials (
-                        full_name, office_title, district_id, party,
-                        email, phone, website, term_start, term_end,
-                        source_type, source_id
-                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+            async with conn.transaction():
+                await conn.execute(f'''
+                    CREATE TEMP TABLE stage_officials ON COMMIT DROP AS
+                    SELECT {columns} FROM officials WITH NO DATA;
+                    ALTER TABLE stage_officials ADD COLUMN ord BIGSERIAL;
+                ''')
+                await conn.copy_records_to_table(
+                    'stage_officials', records=records, columns=OFFICIAL_COLUMNS
+                )
+                await conn.execute(f'''
+                    INSERT INTO officials ({columns})
+                    SELECT {columns} FROM (
+                        SELECT DISTINCT ON (source_type, source_id) *
+                        FROM stage_officials
+                        WHERE source_type IS NOT NULL AND source_id IS NOT NULL
+                        ORDER BY source_type, source_id, ord DESC
+                    ) latest
+                    UNION ALL
+                    SELECT {columns} FROM stage_officials
+                    WHERE source_type IS NULL OR source_id IS NULL
                     ON CONFLICT (source_type, source_id)
                     DO UPDATE SET
                         full_name = EXCLUDED.full_name,
@@ -78,17 +186,13 @@ class DataSync:
                         phone = EXCLUDED.phone,
                         website = EXCLUDED.website,
                         updated_at = CURRENT_TIMESTAMP
-                ''', official['name'], official['title'],
-                     official['district_id'], official['party'],
-                     official['email'], official['phone'],
-                     official['website'], official['term_start'],
-                     official['term_end'], official['source'],
-                     official['source_id'])
+                ''')
     
     async def sync_all(self):
         """Synchronize all data sources."""
         try:
             await self.init_db_pool()
+            await self.init_http_session()
             
             # Update sync status
             async with self.pool.acquire() as conn:
@@ -101,14 +205,32 @@ class DataSync:
                         status = EXCLUDED.status
                 ''', 'full_sync', datetime.now(), 'running')
             
-            # Fetch and process data from each source
-            openstates_data = await self.fetch_openstates_data()
-            census_data = await self.fetch_census_data()
+            # Fetch from both sources concurrently; if one fails the other is
+            # cancelled and awaited rather than left running unobserved
+            fetches = [
+                asyncio.ensure_future(self.fetch_openstates_data()),
+                asyncio.ensure_future(self.fetch_census_data())
+            ]
+            try:
+                openstates_data, census_data = await asyncio.gather(*fetches)
+            except BaseException:
+                for task in fetches:
+                    task.cancel()
+                await asyncio.gather(*fetches, return_exceptions=True)
+                raise
             
             # Update database
             await self.update_districts(census_data)
             await self.update_officials(openstates_data)
             
+            # Ensure the spatial index exists and refresh planner statistics
+            async with self.pool.acquire() as conn:
+                await conn.execute('''
+                    CREATE INDEX IF NOT EXISTS districts_boundary_idx
+                        ON districts USING GIST (boundary);
+                    ANALYZE districts;
+                ''')
+            
             # Update sync status
             async with self.pool.acquire() as conn:
                 await conn.execute('''
@@ -127,8 +249,7 @@ class DataSync:
                         WHERE source_name = $3
                     ''', 'error', str(e), 'full_sync')
         finally:
-            if self.pool:
-                await self.pool.close()
+            await self.close()
 
 if __name__ == "__main__":
     # Example usage
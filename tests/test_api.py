@@ -1,17 +1,88 @@
 """Test suite for Civic Data Hub API."""
 
+import asyncio
+import httpx
 import pytest
+from collections import defaultdict
+from cachetools import TTLCache
+from fastapi import HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import json
-from src.api.main import app
+from shapely import wkb
+from shapely.geometry import Point
+from src.api.main import (
+    app, CACHED_LOOKUP_SQL, GEOCODED_LOOKUP_SQL, POINT_LOOKUP_SQL, DISTRICTS_AT_POINT_SQL,
+    DISTRICTS_OF_TYPE_AT_POINT_SQL, AddressLock, ConcurrencyLimitMiddleware,
+    encode_geometry
+)
 
 client = TestClient(app)
 
+LOOKUP_PAYLOAD = {
+    "districts": [
+        {
+            "id": 1,
+            "name": "Test District",
+            "district_type": "state_house",
+            "state_fips": "17",
+            "district_code": "HD-1"
+        }
+    ],
+    "officials": [
+        {
+            "id": 1,
+            "full_name": "John Doe",
+            "office_title": "State Representative",
+            "party": "Independent",
+            "email": "john.doe@state.gov",
+            "phone": "555-0123",
+            "website": "https://doe.gov"
+        }
+    ]
+}
+
+def attach_statements(conn_mock, fetch, fetchrow):
+    """Attach mock prepared statements that forward to the SQL-dispatching mocks."""
+    for name, query in (
+        ("cached_lookup", CACHED_LOOKUP_SQL),
+        ("geocoded_lookup", GEOCODED_LOOKUP_SQL),
+        ("point_lookup", POINT_LOOKUP_SQL),
+        ("districts_at_point", DISTRICTS_AT_POINT_SQL),
+        ("districts_of_type_at_point", DISTRICTS_OF_TYPE_AT_POINT_SQL),
+    ):
+        statement = MagicMock()
+        statement.fetch = lambda *args, query=query: fetch(query, *args)
+        statement.fetchrow = lambda *args, query=query: fetchrow(query, *args)
+        setattr(conn_mock, name, statement)
+
+def mock_cursor(fetch):
+    """Build a mock conn.cursor() iterating over the rows of the fetch mock."""
+    def cursor(query, *args, **kwargs):
+        async def rows():
+            for row in await fetch(query, *args):
+                yield row
+        return rows()
+    return cursor
+
+@pytest.fixture(autouse=True)
+def lookup_cache():
+    """Give every test an empty in-process lookup cache."""
+    app.state.lookup_cache = TTLCache(maxsize=100, ttl=60)
+    app.state.lookup_locks = defaultdict(AddressLock)
+    app.state.feature_cache = TTLCache(maxsize=1024 * 1024, ttl=60, getsizeof=len)
+    return app.state.lookup_cache
+
 @pytest.fixture
 def mock_db_pool():
     """Mock database pool for testing."""
     async def mock_fetch(*args, **kwargs):
+        if "unnest" in args[0]:
+            return [
+                {"idx": idx, "payload": json.dumps(LOOKUP_PAYLOAD)}
+                for idx in args[1]
+            ]
         if "districts" in args[0]:
             return [
                 {
@@ -20,33 +91,57 @@ def mock_db_pool():
                     "district_type": "state_house",
                     "state_fips": "17",
                     "district_code": "HD-1",
+                    "updated_at": "2024-01-01T00:00:00",
                     "geometry": json.dumps({
                         "type": "MultiPolygon",
                         "coordinates": [[[[0, 0], [0, 1], [1, 1], [1, 0], [0, 0]]]]
                     })
                 }
             ]
-        elif "officials" in args[0]:
-            return [
-                {
+        return []
+
+    async def mock_fetchrow(*args, **kwargs):
+        if "address_cache" in args[0] or args[0] == POINT_LOOKUP_SQL:
+            return {
+                "located": True,
+                "location": Point(-74.0060, 40.7128),
+                "payload": json.dumps(LOOKUP_PAYLOAD)
+            }
+        if "offices" in args[0]:
+            return {
+                "official": json.dumps({
                     "id": 1,
                     "full_name": "John Doe",
                     "office_title": "State Representative",
-                    "party": "Independent",
-                    "email": "john.doe@state.gov",
-                    "phone": "555-0123",
-                    "website": "https://doe.gov"
-                }
-            ]
-        return []
+                    "district_name": "Test District",
+                    "district_type": "state_house"
+                }),
+                "offices": "[]"
+            }
+        return None
 
     pool_mock = MagicMock()
     conn_mock = MagicMock()
     conn_mock.fetch = mock_fetch
-    conn_mock.fetchrow = mock_fetch
+    conn_mock.fetchrow = mock_fetchrow
+    conn_mock.cursor = mock_cursor(mock_fetch)
+    attach_statements(conn_mock, mock_fetch, mock_fetchrow)
     pool_mock.acquire.return_value.__aenter__.return_value = conn_mock
     return pool_mock
 
+def test_encode_geometry():
+    """Test that geometries are sent as EWKB in SRID 4326 and round-trip."""
+    point = Point(-74.0060, 40.7128)
+    encoded = encode_geometry(point)
+    
+    # Little-endian EWKB point with the SRID flag set, followed by the SRID
+    assert encoded[:5] == bytes.fromhex("0101000020")
+    assert int.from_bytes(encoded[5:9], "little") == 4326
+    
+    decoded = wkb.loads(encoded)
+    assert decoded.equals(point)
+    assert (decoded.x, decoded.y) == (point.x, point.y)
+
 @pytest.mark.asyncio
 async def test_lookup_representatives(mock_db_pool):
     """Test the representative lookup endpoint."""
@@ -62,6 +157,31 @@ async def test_lookup_representatives(mock_db_pool):
         assert data["districts"][0]["name"] == "Test District"
         assert data["officials"][0]["full_name"] == "John Doe"
 
+@pytest.mark.asyncio
+async def test_lookup_uses_process_cache(mock_db_pool, lookup_cache):
+    """Test that repeated lookups reuse the cached location but read fresh data."""
+    with patch('src.api.main.geocode_address', return_value=(40.7128, -74.0060)):
+        app.state.pool = mock_db_pool
+        first = client.get("/api/v1/lookup?address=123 Main St, New York, NY")
+        assert first.status_code == 200
+        assert lookup_cache["123 main st, new york, ny"] == Point(-74.0060, 40.7128)
+
+        conn = mock_db_pool.acquire.return_value.__aenter__.return_value
+        conn.cached_lookup = MagicMock()
+        conn.point_lookup.fetchrow = AsyncMock(return_value={
+            "located": True,
+            "location": Point(-74.0060, 40.7128),
+            "payload": json.dumps({**LOOKUP_PAYLOAD, "officials": []})
+        })
+        second = client.get("/api/v1/lookup?address=123 MAIN ST, New York, NY")
+        assert second.status_code == 200
+        assert not conn.cached_lookup.fetchrow.called
+        conn.point_lookup.fetchrow.assert_awaited_once_with(Point(-74.0060, 40.7128))
+        assert second.json()["address"] == "123 MAIN ST, New York, NY"
+        assert second.json()["districts"] == first.json()["districts"]
+        # Officials changed by a sync are visible immediately
+        assert second.json()["officials"] == []
+
 @pytest.mark.asyncio
 async def test_get_district_boundaries(mock_db_pool):
     """Test the district boundaries endpoint."""
@@ -73,6 +193,78 @@ async def test_get_district_boundaries(mock_db_pool):
     assert len(data["features"]) > 0
     assert data["features"][0]["properties"]["name"] == "Test District"
     assert "geometry" in data["features"][0]
+    assert data["features"][0]["geometry"]["type"] == "MultiPolygon"
+
+@pytest.mark.asyncio
+async def test_get_district_boundaries_by_type(mock_db_pool):
+    """Test filtering district boundaries by district type."""
+    app.state.pool = mock_db_pool
+    conn = mock_db_pool.acquire.return_value.__aenter__.return_value
+    conn.districts_of_type_at_point.fetch = AsyncMock(
+        return_value=[{"id": 1, "updated_at": "2024-01-01T00:00:00"}]
+    )
+    response = client.get(
+        "/api/v1/districts?lat=40.7128&lng=-74.0060&district_type=state_house"
+    )
+    assert response.status_code == 200
+    conn.districts_of_type_at_point.fetch.assert_awaited_once_with(
+        -74.0060, 40.7128, "state_house"
+    )
+    assert response.json()["features"][0]["properties"]["district_type"] == "state_house"
+
+@pytest.mark.asyncio
+async def test_district_boundaries_use_feature_cache(mock_db_pool):
+    """Test that cached district features are served without a cursor."""
+    app.state.pool = mock_db_pool
+    first = client.get("/api/v1/districts?lat=40.7128&lng=-74.0060")
+    assert first.status_code == 200
+    assert (1, "2024-01-01T00:00:00") in app.state.feature_cache
+
+    conn = mock_db_pool.acquire.return_value.__aenter__.return_value
+    conn.cursor = MagicMock()
+    second = client.get("/api/v1/districts?lat=40.7128&lng=-74.0060")
+    assert second.status_code == 200
+    assert not conn.cursor.called
+    assert second.json() == first.json()
+
+@pytest.mark.asyncio
+async def test_lookup_lock_survives_failed_resolve():
+    """Test that callers queued behind a failed resolve still resolve one at a time."""
+    calls = 0
+    active = 0
+    peak = 0
+
+    async def resolve(address, normalized_address):
+        nonlocal calls, active, peak
+        calls += 1
+        active += 1
+        peak = max(peak, active)
+        try:
+            await asyncio.sleep(0.02)
+            if calls == 1:
+                raise HTTPException(status_code=503, detail="Geocoder unavailable")
+            return json.dumps(LOOKUP_PAYLOAD).encode()
+        finally:
+            active -= 1
+
+    async def late_lookup(http):
+        # Arrives after the first resolve failed, while a waiter is resolving
+        await asyncio.sleep(0.03)
+        return await http.get("/api/v1/lookup", params={"address": "123 Main St"})
+
+    transport = httpx.ASGITransport(app=app)
+    with patch('src.api.main.fetch_representatives', side_effect=resolve):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            responses = await asyncio.gather(
+                http.get("/api/v1/lookup", params={"address": "123 Main St"}),
+                http.get("/api/v1/lookup", params={"address": "123 Main St"}),
+                late_lookup(http)
+            )
+
+    assert [r.status_code for r in responses] == [503, 200, 200]
+    assert peak == 1
+    assert calls == 3
+    assert not app.state.lookup_locks
 
 @pytest.mark.asyncio
 async def test_bulk_lookup(mock_db_pool):
@@ -87,6 +279,86 @@ async def test_bulk_lookup(mock_db_pool):
         for result in data["results"]:
             assert "address" in result
             assert "result" in result or "error" in result
+            assert result["error"] is None
+            assert result["result"]["districts"][0]["name"] == "Test District"
+            assert result["result"]["officials"][0]["full_name"] == "John Doe"
+            assert "district_id" not in result["result"]["officials"][0]
+
+@pytest.mark.asyncio
+async def test_bulk_lookup_maps_results_to_addresses(lookup_cache):
+    """Test that mixed bulk results each land on their own address."""
+    lookup_cache["cached st"] = Point(-1.0, 1.0)
+    geocoded = {"found st": (2.0, -2.0), "empty st": (3.0, -3.0)}
+
+    async def geocode(address):
+        if address.lower() not in geocoded:
+            raise HTTPException(status_code=404, detail="Address not found")
+        return geocoded[address.lower()]
+
+    batch = {}
+
+    async def mock_fetch(query, *args):
+        if "unnest" not in query:
+            return []
+        idx, locations, raw_addresses, normalized = args
+        batch.update(zip(normalized, zip(locations, raw_addresses)))
+        # Rows come back out of order, and "empty st" matches no district
+        return [
+            {"idx": i, "payload": json.dumps({
+                "districts": [{"name": f"District of {normalized[i]}"}],
+                "officials": []
+            })}
+            for i in reversed(idx) if normalized[i] != "empty st"
+        ]
+
+    pool_mock = MagicMock()
+    conn_mock = MagicMock()
+    conn_mock.fetch = mock_fetch
+    pool_mock.acquire.return_value.__aenter__.return_value = conn_mock
+    app.state.pool = pool_mock
+
+    addresses = ["Empty St", "Cached St", "Missing St", "Found St"]
+    with patch('src.api.main.geocode_address', side_effect=geocode):
+        response = client.get("/api/v1/bulk-lookup", params={"addresses": addresses})
+    assert response.status_code == 200
+    results = {r["address"]: r for r in response.json()["results"]}
+
+    assert results["Cached St"]["result"]["districts"][0]["name"] == "District of cached st"
+    assert results["Found St"]["result"]["districts"][0]["name"] == "District of found st"
+    assert results["Found St"]["result"]["address"] == "Found St"
+    assert results["Missing St"]["result"] is None
+    assert results["Missing St"]["error"] == "Address not found"
+    assert results["Empty St"]["result"] is None
+    assert results["Empty St"]["error"] == "No districts found for this address"
+
+    # Only fresh geocodes carry an address to be written to address_cache
+    assert batch["cached st"] == (Point(-1.0, 1.0), None)
+    assert batch["found st"] == (Point(-2.0, 2.0), "Found St")
+    assert "missing st" not in batch
+
+@pytest.mark.asyncio
+async def test_bulk_lookup_database_error(mock_db_pool):
+    """Test that a failed bulk query is reported per address, not as a 500."""
+    conn = mock_db_pool.acquire.return_value.__aenter__.return_value
+    cached_locations = conn.fetch
+
+    async def failing_fetch(query, *args, **kwargs):
+        if "unnest" in query:
+            raise asyncio.TimeoutError()
+        return await cached_locations(query, *args, **kwargs)
+
+    conn.fetch = failing_fetch
+    with patch('src.api.main.geocode_address', return_value=(40.7128, -74.0060)):
+        app.state.pool = mock_db_pool
+        response = client.get("/api/v1/bulk-lookup?addresses=123 Main St, NY&addresses=456 Elm St, NY")
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert len(results) == 2
+        for result in results:
+            assert result["result"] is None
+            assert result["error"] == "TimeoutError"
+    # Only the geocoded locations are cached, never a payload
+    assert all(isinstance(v, Point) for v in app.state.lookup_cache.values())
 
 @pytest.mark.asyncio
 async def test_get_official_details(mock_db_pool):
@@ -112,14 +384,44 @@ async def test_no_districts_found(mock_db_pool):
     async def mock_fetch_empty(*args, **kwargs):
         return []
 
+    async def mock_fetchrow_empty(*args, **kwargs):
+        located = "INSERT INTO address_cache" in args[0]
+        location = Point(0, 0) if located else None
+        return {"located": located, "location": location, "payload": None}
+
     pool_mock = MagicMock()
     conn_mock = MagicMock()
     conn_mock.fetch = mock_fetch_empty
-    conn_mock.fetchrow = mock_fetch_empty
+    conn_mock.fetchrow = mock_fetchrow_empty
+    attach_statements(conn_mock, mock_fetch_empty, mock_fetchrow_empty)
     pool_mock.acquire.return_value.__aenter__.return_value = conn_mock
 
     with patch('src.api.main.geocode_address', return_value=(0, 0)):
         app.state.pool = pool_mock
         response = client.get("/api/v1/lookup?address=123 Main St")
         assert response.status_code == 404
-        assert "No districts found" in response.json()["detail"]
\ No newline at end of file
+        assert "No districts found" in response.json()["detail"]
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_rejects_when_busy():
+    """Test that requests past the in-flight limit get a 503."""
+    release = asyncio.Event()
+
+    async def slow_app(scope, receive, send):
+        await release.wait()
+        await PlainTextResponse("ok")(scope, receive, send)
+
+    limited = ConcurrencyLimitMiddleware(slow_app, limit=1)
+    transport = httpx.ASGITransport(app=limited)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        first = asyncio.create_task(http.get("/"))
+        while limited.in_flight == 0:
+            await asyncio.sleep(0)
+
+        busy = await http.get("/")
+        assert busy.status_code == 503
+        assert busy.headers["retry-after"] == "1"
+
+        release.set()
+        assert (await first).status_code == 200
+        assert limited.in_flight == 0
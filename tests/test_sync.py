@@ -5,7 +5,7 @@ from unittest.mock import patch, MagicMock, AsyncMock
 import json
 import asyncio
 from datetime import datetime
-from src.sync.core import DataSync
+from src.sync.core import DataSync, DISTRICT_COLUMNS, OFFICIAL_COLUMNS
 
 @pytest.fixture
 def mock_config():
@@ -38,6 +38,8 @@ def mock_openstates_data():
             "email": "john.smith@state.gov",
             "phone": "555-0123",
             "website": "https://smith.gov",
+            "term_start": None,
+            "term_end": None,
             "source": "openstates",
             "source_id": "123"
         }
@@ -62,11 +64,13 @@ def mock_census_data():
 @pytest.fixture
 def mock_db_pool():
     """Create mock database pool."""
-    pool = AsyncMock()
+    pool = MagicMock()
+    pool.close = AsyncMock()
     
     # Mock connection context manager
     conn = AsyncMock()
     pool.acquire.return_value.__aenter__.return_value = conn
+    conn.transaction = MagicMock()
     
     # Mock database operations
     conn.execute = AsyncMock()
@@ -86,11 +90,17 @@ async def test_fetch_openstates_data(mock_config):
     
     mock_session = MagicMock()
     mock_session.get.return_value.__aenter__.return_value = mock_response
+    mock_session.close = AsyncMock()
     
     with patch('aiohttp.ClientSession', return_value=mock_session):
         data = await sync.fetch_openstates_data()
         assert len(data) == 1
         assert data[0]["name"] == "Test Data"
+    
+    # The lazily opened session is released by close()
+    await sync.close()
+    assert mock_session.close.called
+    assert sync.session is None
 
 @pytest.mark.asyncio
 async def test_update_districts(mock_config, mock_db_pool, mock_census_data):
@@ -102,10 +112,18 @@ async def test_update_districts(mock_config, mock_db_pool, mock_census_data):
     
     # Verify database was called with correct parameters
     conn = mock_db_pool.acquire.return_value.__aenter__.return_value
-    assert conn.execute.called
-    call_args = conn.execute.call_args_list[0]
-    assert "INSERT INTO districts" in call_args[0][0]
-    assert call_args[0][1] == "state_senate"  # First parameter should be district_type
+    assert conn.copy_records_to_table.call_count == 1
+    copy_args = conn.copy_records_to_table.call_args
+    assert copy_args[0][0] == "stage_districts"
+    records = list(copy_args[1]["records"])
+    assert len(records) == 1
+    assert records[0][0] == "state_senate"  # First column should be district_type
+    assert isinstance(records[0][4], str)  # GeoJSON is staged as text
+    
+    # Staged GeoJSON is parsed and merged with a single upsert
+    merge_sql = conn.execute.call_args_list[-1][0][0]
+    assert "INSERT INTO districts" in merge_sql
+    assert "ST_GeomFromGeoJSON" in merge_sql
 
 @pytest.mark.asyncio
 async def test_update_officials(mock_config, mock_db_pool, mock_openstates_data):
@@ -117,10 +135,61 @@ async def test_update_officials(mock_config, mock_db_pool, mock_openstates_data)
     
     # Verify database was called with correct parameters
     conn = mock_db_pool.acquire.return_value.__aenter__.return_value
-    assert conn.execute.called
-    call_args = conn.execute.call_args_list[0]
-    assert "INSERT INTO officials" in call_args[0][0]
-    assert call_args[0][1] == "John Smith"  # First parameter should be full_name
+    assert conn.copy_records_to_table.call_count == 1
+    copy_args = conn.copy_records_to_table.call_args
+    assert copy_args[0][0] == "stage_officials"
+    records = list(copy_args[1]["records"])
+    assert len(records) == 1
+    assert records[0][0] == "John Smith"  # First column should be full_name
+    
+    # Staged rows are merged with a single upsert
+    merge_sql = conn.execute.call_args_list[-1][0][0]
+    assert "INSERT INTO officials" in merge_sql
+    assert "FROM stage_officials" in merge_sql
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("method, fixture, stage_table, columns, name_column, key_column, key", [
+    ("update_officials", "mock_openstates_data", "stage_officials",
+     OFFICIAL_COLUMNS, "full_name", "source_id", "source_id"),
+    ("update_districts", "mock_census_data", "stage_districts",
+     DISTRICT_COLUMNS, "name", "district_code", "code"),
+])
+async def test_update_stages_duplicates_and_null_keys(
+    request, mock_config, mock_db_pool,
+    method, fixture, stage_table, columns, name_column, key_column, key
+):
+    """Test that duplicates and NULL keys are all staged, in input order.
+    
+    The merge keeps the highest staging ordinal per key, so staging order
+    is what makes the last duplicate win.
+    """
+    sync = DataSync(mock_config["db_config"], mock_config["source_config"])
+    sync.pool = mock_db_pool
+    
+    base = request.getfixturevalue(fixture)[0]
+    rows = [
+        base,
+        {**base, "name": "No key A", key: None},
+        {**base, "name": "No key B", key: None},
+        {**base, "name": "Latest"},  # Same key as the first row
+    ]
+    await getattr(sync, method)(rows)
+    
+    conn = mock_db_pool.acquire.return_value.__aenter__.return_value
+    copy_args = conn.copy_records_to_table.call_args
+    assert copy_args[0][0] == stage_table
+    # The ordinal is not copied; the staging table numbers rows as they arrive
+    assert copy_args[1]["columns"] == columns
+    assert "ord" not in columns
+    
+    records = list(copy_args[1]["records"])
+    names = [r[columns.index(name_column)] for r in records]
+    keys = [r[columns.index(key_column)] for r in records]
+    assert names == [base["name"], "No key A", "No key B", "Latest"]
+    assert keys == [base[key], None, None, base[key]]
+    
+    # One statement creates the staging table and one merges it
+    assert conn.execute.call_count == 2
 
 @pytest.mark.asyncio
 async def test_sync_all(mock_config, mock_db_pool):
@@ -161,6 +230,33 @@ async def test_sync_error_handling(mock_config, mock_db_pool):
     assert "UPDATE data_sources" in call_args[0][0]
     assert call_args[0][1] == "error"  # Status should be error
 
+@pytest.mark.asyncio
+async def test_sync_cancels_pending_fetch(mock_config, mock_db_pool):
+    """Test that a failed source fetch cancels the other in-flight fetch."""
+    sync = DataSync(mock_config["db_config"], mock_config["source_config"])
+    sync.pool = mock_db_pool
+    sync.init_db_pool = AsyncMock()
+    
+    cancelled = asyncio.Event()
+    
+    async def slow_census_fetch():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+    
+    sync.fetch_openstates_data = AsyncMock(side_effect=Exception("API Error"))
+    sync.fetch_census_data = slow_census_fetch
+    sync.update_districts = AsyncMock()
+    
+    await sync.sync_all()
+    
+    assert cancelled.is_set()
+    assert not sync.update_districts.called
+    conn = mock_db_pool.acquire.return_value.__aenter__.return_value
+    assert conn.execute.call_args_list[-1][0][1] == "error"
+
 @pytest.mark.asyncio
 async def test_data_source_tracking(mock_config, mock_db_pool):
     """Test tracking of data source sync status."""